@@ -5,6 +5,8 @@ import random
 import logging
 import sys
 import argparse
+from itertools import groupby, repeat
+from operator import itemgetter
 
 # For colored logging
 try:
@@ -17,27 +19,58 @@ except ImportError:
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 
+def _hamming_7_4_compute_codeword(nibble):
+    """Encode a 4-bit nibble into a 7-bit Hamming (7,4) codeword, both MSB first."""
+    # Each parity bit is the XOR of the data bits selected by its mask
+    c1 = bin(nibble & 0b1101).count('1') & 1  # d0 ^ d1 ^ d3
+    c2 = bin(nibble & 0b1011).count('1') & 1  # d0 ^ d2 ^ d3
+    c3 = bin(nibble & 0b0111).count('1') & 1  # d1 ^ d2 ^ d3
+    return (c1 << 6) | (c2 << 5) | (c3 << 4) | nibble
+
+def _hamming_7_4_syndrome(word):
+    """Compute the 3-bit syndrome of a 7-bit Hamming (7,4) word, MSB first."""
+    # Each syndrome bit is the parity of the received bits selected by its mask
+    s0 = bin(word & 0b1001101).count('1') & 1  # r0 ^ r3 ^ r4 ^ r6
+    s1 = bin(word & 0b0101011).count('1') & 1  # r1 ^ r3 ^ r5 ^ r6
+    s2 = bin(word & 0b0010111).count('1') & 1  # r2 ^ r4 ^ r5 ^ r6
+    return (s0 << 2) | (s1 << 1) | s2
+
+def _hamming_7_4_decode_entry(word):
+    """Compute the (data nibble, syndrome, corrected codeword) entry for a received word."""
+    syndrome = _hamming_7_4_syndrome(word)
+    corrected = word
+    if syndrome != 0:
+        # Position syndrome - 1 counts from the most significant bit
+        corrected ^= 1 << (7 - syndrome)
+    return corrected & 0b1111, syndrome, corrected
+
+# The code is small enough to tabulate completely: 16 data nibbles and 128
+# received words, packed into ints with the first bit as the most significant
+_HAMMING_7_4_ENC = tuple(_hamming_7_4_compute_codeword(n) for n in range(16))
+_HAMMING_7_4_DEC = tuple(_hamming_7_4_decode_entry(w) for w in range(128))
+_HAMMING_7_4_ENC_BITS = tuple(
+    tuple((codeword >> i) & 1 for i in (6, 5, 4, 3, 2, 1, 0))
+    for codeword in _HAMMING_7_4_ENC
+)
+
+def hamming_7_4_encode_packed(nibble):
+    """Encode a 4-bit nibble into a 7-bit Hamming (7,4) codeword packed in an int."""
+    return _HAMMING_7_4_ENC[nibble]
+
+def hamming_7_4_decode_packed(word):
+    """Decode a packed 7-bit codeword into (data nibble, syndrome, corrected codeword)."""
+    return _HAMMING_7_4_DEC[word]
+
 def hamming_7_4_encode(data_bits):
     """Encode 4 bits of data into 7 bits using Hamming (7,4) code."""
     d = data_bits  # Should be a list of 4 bits
-    c = [0] * 7
-    c[3] = d[0]
-    c[4] = d[1]
-    c[5] = d[2]
-    c[6] = d[3]
-    c[0] = d[0] ^ d[1] ^ d[3]  # c1
-    c[1] = d[0] ^ d[2] ^ d[3]  # c2
-    c[2] = d[1] ^ d[2] ^ d[3]  # c3
-    return c
+    return list(_HAMMING_7_4_ENC_BITS[(d[0] << 3) | (d[1] << 2) | (d[2] << 1) | d[3]])
 
 def hamming_7_4_decode(codeword):
     r = codeword  # Should be a list of 7 bits
-    s = [0, 0, 0]
-    s[0] = r[0] ^ r[3] ^ r[4] ^ r[6]
-    s[1] = r[1] ^ r[3] ^ r[5] ^ r[6]
-    s[2] = r[2] ^ r[4] ^ r[5] ^ r[6]
-    syndrome = (s[0] << 2) | (s[1] << 1) | s[2]
-    logging.debug(f"Syndrome: {syndrome} (binary: {''.join(map(str, s))})")
+    word = (r[0] << 6) | (r[1] << 5) | (r[2] << 4) | (r[3] << 3) | (r[4] << 2) | (r[5] << 1) | r[6]
+    _, syndrome, _ = hamming_7_4_decode_packed(word)
+    logging.debug(f"Syndrome: {syndrome} (binary: {syndrome:03b})")
 
     if syndrome != 0:
         error_pos = syndrome - 1  # Positions are from 0 to 6
@@ -47,25 +80,40 @@ def hamming_7_4_decode(codeword):
     data_bits = [r[3], r[4], r[5], r[6]]
     return data_bits, syndrome
 
-def log_colored(message, color):
-    """Log messages with color."""
-    logging.info(f"{color}{message}{Style.RESET_ALL}")
+def _colored(message, color):
+    """Wrap a message in a color, resetting the style at its end."""
+    return f"{color}{message}{Style.RESET_ALL}"
+
+def _flush_report(report):
+    """Log buffered report lines as a single record and clear the buffer."""
+    if report:
+        logging.info('\n'.join(report))
+        report.clear()
+
+def _bitflip_bytes(data, bit):
+    """Flip a specific bit in a bytearray."""
+    data[bit >> 3] ^= 1 << (bit & 7)
+
+def _bitflip_list(data, bit):
+    """Flip a specific bit in a list of bits."""
+    data[bit] ^= 1
 
 def bitflip(data, bit):
     """Flip a specific bit in data."""
     if isinstance(data, bytearray):
-        byte_index = bit // 8
-        bit_index = bit % 8
-        data[byte_index] ^= 1 << bit_index
+        _bitflip_bytes(data, bit)
     elif isinstance(data, list):
-        data[bit] ^= 1
+        _bitflip_list(data, bit)
     else:
         raise TypeError("Unsupported data type for bitflip")
 
 def encode_message(bch, data):
     """Encode the data using BCH encoder."""
-    ecc = bch.encode(data)
-    return data + ecc
+    data_len = len(data)
+    codeword = bytearray(data_len + bch.ecc_bytes)
+    codeword[:data_len] = data
+    codeword[data_len:] = bch.encode(data)
+    return codeword
 
 def inject_errors(data, num_errors=0, specific_bits=None):
     """
@@ -89,13 +137,23 @@ def inject_errors(data, num_errors=0, specific_bits=None):
         error_positions = random.sample(range(data_len_bits), num_errors)
     
     if isinstance(data, bytearray):
-        data_with_errors = bytearray(data)
+        # Read little-endian so bit positions map directly onto integer bits,
+        # then flip all of them with a single XOR
+        num_bits = len(data) * 8
+        mask = 0
         for bit in error_positions:
-            bitflip(data_with_errors, bit)
+            # Accept the same range as bytearray indexing, wrapping negatives
+            if not -num_bits <= bit < num_bits:
+                raise IndexError("Bit position out of range")
+            mask ^= 1 << (bit % num_bits)
+        corrupted = int.from_bytes(data, 'little') ^ mask
+        data_with_errors = bytearray(corrupted.to_bytes(len(data), 'little'))
     elif isinstance(data, list):
         data_with_errors = data[:]
+        # The type is already known here, so skip bitflip's per-call dispatch
+        flip = _bitflip_list
         for bit in error_positions:
-            bitflip(data_with_errors, bit)
+            flip(data_with_errors, bit)
     else:
         raise TypeError("Unsupported data type for inject_errors")
     
@@ -103,174 +161,250 @@ def inject_errors(data, num_errors=0, specific_bits=None):
 
 def decode_and_correct(bch, corrupted_data):
     """Decode and correct the corrupted data."""
-    data = corrupted_data[:-bch.ecc_bytes]
-    recv_ecc = corrupted_data[-bch.ecc_bytes:]
+    ecc_bytes = bch.ecc_bytes
+    # bchlib accepts any buffer, so decode from zero-copy views of the input
+    with memoryview(corrupted_data) as received:
+        nerr = bch.decode(received[:-ecc_bytes], received[-ecc_bytes:])
 
-    nerr = bch.decode(data, recv_ecc)
     if nerr >= 0:
-        corrected_data = bytearray(data)
-        corrected_ecc = bytearray(recv_ecc)
-        bch.correct(corrected_data, corrected_ecc)
-        return corrected_data + corrected_ecc, bch.errloc
+        # Correct one copy of the whole codeword through views of its data and
+        # ECC parts, so they don't have to be concatenated afterwards
+        corrected_data = bytearray(corrupted_data)
+        with memoryview(corrected_data) as view:
+            bch.correct(view[:-ecc_bytes], view[-ecc_bytes:])
+        return corrected_data, bch.errloc
     else:
         return None, None
 
+# Run markers for visualize_changes; other runs are keyed by their Fore color
+_PLAIN = ''
+_MIXED = None
+# Injected-and-corrected bits show the original digit in red and the corrected
+# one in green; there are only four such pairs, so build them once
+_MIXED_BITS = {
+    (orig_bit, corrected_bit): Fore.RED + orig_bit + Fore.GREEN + corrected_bit
+    for orig_bit in '01' for corrected_bit in '01'
+}
+
 def visualize_changes(original, corrupted, corrected, injected_bits, corrected_bits):
     """Visualize changes with colors for errors and corrections."""
-    output = []
+    # Membership is checked for every bit, so avoid linear list scans
+    injected_bits = frozenset(injected_bits)
+    corrected_bits = frozenset(corrected_bits)
+
     if isinstance(original, bytearray):
         total_bits = len(original) * 8
-
-        for bit in range(total_bits):
-            byte_index = bit // 8
-            bit_in_byte = 7 - (bit % 8)
-            bit_mask = 1 << bit_in_byte
-
-            orig_bit = (original[byte_index] >> bit_in_byte) & 1
-            corru_bit = (corrupted[byte_index] >> bit_in_byte) & 1
-            corrected_bit = (corrected[byte_index] >> bit_in_byte) & 1
-
-            if bit in injected_bits and bit in corrected_bits:
-                # Injected and corrected
-                output.append(Fore.RED + f"{orig_bit}" + Fore.GREEN + f"{corrected_bit}" + Style.RESET_ALL)
-            elif bit in injected_bits:
-                # Injected but not corrected
-                output.append(Fore.RED + f"{corru_bit}" + Style.RESET_ALL)
-            elif bit in corrected_bits:
-                # Corrected
-                output.append(Fore.GREEN + f"{corrected_bit}" + Style.RESET_ALL)
-            else:
-                # Unchanged
-                output.append(f"{orig_bit}")
-
-            # Add a space every 8 bits
-            if bit % 8 == 7:
-                output.append(" ")
-
+        # Unpack each buffer once into an MSB-first string of '0'/'1'
+        orig_str = format(int.from_bytes(original, 'big'), f'0{total_bits}b')
+        corru_str = format(int.from_bytes(corrupted, 'big'), f'0{total_bits}b')
+        corrected_str = format(int.from_bytes(corrected, 'big'), f'0{total_bits}b')
+        group_bytes = True
     elif isinstance(original, list):
         total_bits = len(original)
-        for bit in range(total_bits):
-            orig_bit = original[bit]
-            corru_bit = corrupted[bit]
-            corrected_bit = corrected[bit]
-
-            if bit in injected_bits and bit in corrected_bits:
-                # Injected and corrected
-                output.append(Fore.RED + f"{orig_bit}" + Fore.GREEN + f"{corrected_bit}" + Style.RESET_ALL)
-            elif bit in injected_bits:
-                # Injected but not corrected
-                output.append(Fore.RED + f"{corru_bit}" + Style.RESET_ALL)
-            elif bit in corrected_bits:
-                # Corrected
-                output.append(Fore.GREEN + f"{corrected_bit}" + Style.RESET_ALL)
-            else:
-                # Unchanged
-                output.append(f"{orig_bit}")
+        orig_str = ''.join(map(str, original))
+        corru_str = ''.join(map(str, corrupted))
+        corrected_str = ''.join(map(str, corrected))
+        group_bytes = False
     else:
         raise TypeError("Unsupported data type for visualize_changes")
 
+    # Tag every bit with its color so runs of equal color can be merged below
+    tokens = []
+    for bit in range(total_bits):
+        orig_bit = orig_str[bit]
+        corru_bit = corru_str[bit]
+        corrected_bit = corrected_str[bit]
+
+        if bit in injected_bits and bit in corrected_bits:
+            # Injected and corrected
+            token = [_MIXED, _MIXED_BITS[orig_bit, corrected_bit]]
+        elif bit in injected_bits:
+            # Injected but not corrected
+            token = [Fore.RED, corru_bit]
+        elif bit in corrected_bits:
+            # Corrected
+            token = [Fore.GREEN, corrected_bit]
+        else:
+            # Unchanged
+            token = [_PLAIN, orig_bit]
+
+        # Add a space every 8 bits
+        if group_bytes and bit % 8 == 7:
+            token[1] += " "
+        tokens.append(token)
+
+    # Set the color once per run instead of once per bit. A new Fore color
+    # overrides the previous one, so a reset is only needed before plain runs
+    # and at the very end
+    output = []
+    colored = False
+    for color, run in groupby(tokens, key=itemgetter(0)):
+        if color == _PLAIN:
+            if colored:
+                output.append(Style.RESET_ALL)
+            colored = False
+        else:
+            if color != _MIXED:
+                output.append(color)
+            colored = True
+        output.extend(bits for _, bits in run)
+    if colored:
+        output.append(Style.RESET_ALL)
+
     return ''.join(output)
 
-def run_test(bch, message, num_errors=0, specific_bits=None, use_hamming=False):
-    """Run a test by encoding, injecting errors, and decoding."""
-    logging.info(f"\n{'-'*40}\nOriginal Message:")
+def _result_report(injected_bits, corrected_bits, all_corrected):
+    """Build the report lines listing corrected and injected bits and the verdict."""
+    lines = []
+    if corrected_bits:
+        lines.append(_colored("\nCorrected Bit Positions:", Fore.GREEN))
+        for bit in corrected_bits:
+            lines.append(_colored(f"Bit {bit}", Fore.GREEN))
+
+    if injected_bits:
+        lines.append(_colored("\nInjected Bit Positions:", Fore.RED))
+        for bit in injected_bits:
+            lines.append(_colored(f"Bit {bit}", Fore.RED))
+
+    if all_corrected:
+        lines.append(_colored("\nAll injected errors were successfully corrected!", Fore.GREEN))
+    else:
+        lines.append(_colored("\nSome injected errors were not corrected!", Fore.RED))
+    return lines
+
+def run_test(bch, message, num_errors=0, specific_bits=None, use_hamming=False, quiet=False):
+    """
+    Run a test by encoding, injecting errors, and decoding.
+    Returns True if exactly the injected errors were corrected. With quiet=True
+    nothing is logged, which suits benchmark and sweep drivers.
+    """
+    # The report is only built when it will be shown: not in quiet mode and
+    # not when INFO records would be dropped anyway. It is logged in two
+    # records, one before decoding and one after, instead of one per line
+    show_report = not quiet and logging.getLogger().isEnabledFor(logging.INFO)
+    header = f"\n{'-'*40}\nOriginal Message:"
     if use_hamming:
-        logging.info(''.join(str(b) for b in message))
         # Encode the message
         codeword = hamming_7_4_encode(message)
-        logging.info("\nEncoded Codeword:")
-        logging.info(''.join(str(b) for b in codeword))
 
         # Inject errors
         if num_errors > 0:
             corrupted_codeword, injected_bits = inject_errors(codeword, num_errors, specific_bits)
-            log_colored(f"\nInjected {num_errors} Errors at bit positions: {injected_bits}", Fore.RED)
-            logging.info("Corrupted Codeword:")
-            logging.info(''.join(str(b) for b in corrupted_codeword))
         else:
             corrupted_codeword = codeword
             injected_bits = []
 
+        # Report the inputs before decoding: the decoder corrects the corrupted
+        # codeword in place, and its debug output should follow this part
+        if show_report:
+            report = [header, ''.join(str(b) for b in message)]
+            report.append("\nEncoded Codeword:")
+            report.append(''.join(str(b) for b in codeword))
+            if num_errors > 0:
+                report.append(_colored(f"\nInjected {num_errors} Errors at bit positions: {injected_bits}", Fore.RED))
+                report.append("Corrupted Codeword:")
+                report.append(''.join(str(b) for b in corrupted_codeword))
+            _flush_report(report)
+
         # Decode and correct
         corrected_data_bits, syndrome = hamming_7_4_decode(corrupted_codeword)
         corrected_codeword = corrupted_codeword
-        logging.info("\nCorrected Codeword:")
-        logging.info(''.join(str(b) for b in corrected_codeword))
-        logging.info("\nDecoded Message:")
-        logging.info(''.join(str(b) for b in corrected_data_bits))
-
-        # Visualize the changes
-        logging.info("\nVisualized Changes (bits):")
         corrected_bits = []
         if syndrome != 0:
             corrected_bits = [syndrome - 1]
-        visualization = visualize_changes(codeword, corrupted_codeword, corrected_codeword, injected_bits, corrected_bits)
-        logging.info(visualization)
 
-        # Log corrected and injected bits
-        if corrected_bits:
-            log_colored("\nCorrected Bit Positions:", Fore.GREEN)
-            for bit in corrected_bits:
-                log_colored(f"Bit {bit}", Fore.GREEN)
+        # Check if all injected errors were corrected
+        all_corrected = set(injected_bits) == set(corrected_bits)
 
-        if injected_bits:
-            log_colored("\nInjected Bit Positions:", Fore.RED)
-            for bit in injected_bits:
-                log_colored(f"Bit {bit}", Fore.RED)
+        if show_report:
+            report = ["\nCorrected Codeword:", ''.join(str(b) for b in corrected_codeword)]
+            report.append("\nDecoded Message:")
+            report.append(''.join(str(b) for b in corrected_data_bits))
 
-        # Check if all injected errors were corrected
-        if set(injected_bits) == set(corrected_bits):
-            log_colored("\nAll injected errors were successfully corrected!", Fore.GREEN)
-        else:
-            log_colored("\nSome injected errors were not corrected!", Fore.RED)
-    else:
-        # Existing code for BCH
-        logging.info(message.hex())
+            # Visualize the changes
+            report.append("\nVisualized Changes (bits):")
+            visualization = visualize_changes(codeword, corrupted_codeword, corrected_codeword, injected_bits, corrected_bits)
+            report.append(visualization)
 
+            report.extend(_result_report(injected_bits, corrected_bits, all_corrected))
+            _flush_report(report)
+    else:
         # Encode the message
         codeword = encode_message(bch, message)
-        logging.info("\nEncoded Codeword:")
-        logging.info(codeword.hex())
 
         # Inject errors
         if num_errors > 0:
             corrupted_codeword, injected_bits = inject_errors(codeword, num_errors, specific_bits)
-            log_colored(f"\nInjected {num_errors} Errors at bit positions: {injected_bits}", Fore.RED)
-            logging.info("Corrupted Codeword:")
-            logging.info(corrupted_codeword.hex())
         else:
             corrupted_codeword = codeword
             injected_bits = []
 
+        # Report the inputs before decoding so a decoding failure follows them
+        if show_report:
+            report = [header, message.hex()]
+            report.append("\nEncoded Codeword:")
+            report.append(codeword.hex())
+            if num_errors > 0:
+                report.append(_colored(f"\nInjected {num_errors} Errors at bit positions: {injected_bits}", Fore.RED))
+                report.append("Corrupted Codeword:")
+                report.append(corrupted_codeword.hex())
+            _flush_report(report)
+
         # Decode and correct
         corrected_codeword, corrected_bits = decode_and_correct(bch, corrupted_codeword)
-        if corrected_codeword:
-            logging.info("\nCorrected Codeword:")
-            logging.info(corrected_codeword.hex())
+        if not corrected_codeword:
+            if not quiet:
+                logging.error("Decoding failed. Unable to correct the errors.")
+            return False
+
+        # Check if all injected errors were corrected
+        all_corrected = set(injected_bits) == set(corrected_bits)
+
+        if show_report:
+            report = ["\nCorrected Codeword:", corrected_codeword.hex()]
 
             # Visualize the changes
-            logging.info("\nVisualized Changes (bits):")
+            report.append("\nVisualized Changes (bits):")
             visualization = visualize_changes(codeword, corrupted_codeword, corrected_codeword, injected_bits, corrected_bits)
-            logging.info(visualization)
-
-            # Log corrected and injected bits
-            if corrected_bits:
-                log_colored("\nCorrected Bit Positions:", Fore.GREEN)
-                for bit in corrected_bits:
-                    log_colored(f"Bit {bit}", Fore.GREEN)
-
-            if injected_bits:
-                log_colored("\nInjected Bit Positions:", Fore.RED)
-                for bit in injected_bits:
-                    log_colored(f"Bit {bit}", Fore.RED)
-
-            # Check if all injected errors were corrected
-            if set(injected_bits) == set(corrected_bits):
-                log_colored("\nAll injected errors were successfully corrected!", Fore.GREEN)
-            else:
-                log_colored("\nSome injected errors were not corrected!", Fore.RED)
+            report.append(visualization)
+
+            report.extend(_result_report(injected_bits, corrected_bits, all_corrected))
+            _flush_report(report)
+
+    return all_corrected
+
+def _tally_trials(bch, codewords, num_errors):
+    """Corrupt and decode each codeword, counting how every trial ended."""
+    stats = {'trials': 0, 'corrected': 0, 'failed': 0, 'miscorrected': 0}
+    for codeword in codewords:
+        corrupted_codeword, _ = inject_errors(codeword, num_errors)
+        corrected_codeword, _ = decode_and_correct(bch, corrupted_codeword)
+
+        stats['trials'] += 1
+        if corrected_codeword is None:
+            stats['failed'] += 1
+        elif corrected_codeword == codeword:
+            stats['corrected'] += 1
         else:
-            logging.error("Decoding failed. Unable to correct the errors.")
+            stats['miscorrected'] += 1
+    return stats
+
+def run_batch(bch, messages, num_errors=0):
+    """
+    Encode, corrupt and decode many messages without any per-message logging.
+    Returns counts of trials that were corrected, failed to decode, or were
+    decoded to a different codeword than the one sent.
+    """
+    codewords = (encode_message(bch, message) for message in messages)
+    return _tally_trials(bch, codewords, num_errors)
+
+def run_trials(bch, message, num_errors=0, trials=1):
+    """
+    Inject fresh random errors into one message's codeword many times.
+    The message is encoded only once; returns the same counts as run_batch.
+    """
+    codeword = encode_message(bch, message)
+    return _tally_trials(bch, repeat(codeword, trials), num_errors)
 
 def main():
     parser = argparse.ArgumentParser(description='BCH Encoder and Decoder with Error Injection')
@@ -351,7 +485,7 @@ def main():
                 message += bytearray(max_data_bytes - len(message))
         else:
             # Generate random message of maximum length
-            message = bytearray(random.getrandbits(8) for _ in range(max_data_bytes))
+            message = bytearray(random.getrandbits(8 * max_data_bytes).to_bytes(max_data_bytes, 'little'))
 
         # Run test
         run_test(bch, message, num_errors=args.num_errors, specific_bits=specific_bits)